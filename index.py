@@ -7,8 +7,8 @@ from pathlib import Path
 from pydantic import BaseModel
 from typing_extensions import Self
 
-from jars import DEFAULT_JARS_JSON, Jars, JarsJar
-from util import StrAlias, sort_dict
+from jars import Jars, JarsJar
+from util import StrAlias, json_dumps, json_loads, sort_dict
 
 
 DIR = Path(__file__).parent
@@ -75,7 +75,7 @@ class Index(BaseModel):
 
     @property
     def all(self) -> chain[IndexMapping]:
-        return chain(*[version.values() for version in self.mappings.values()])
+        return chain.from_iterable(version.values() for version in self.mappings.values())
 
     @classmethod
     def empty(cls) -> Self:
@@ -84,23 +84,27 @@ class Index(BaseModel):
     @classmethod
     def load(cls, file: Path | str = DEFAULT_INDEX_JSON) -> Self:
         logger.info(f"Index.load {file}")
-        return cls.parse_raw(Path(file).read_text())
+        return cls.model_validate(json_loads(Path(file).read_bytes()))
 
     def save(self, file: Path | str = DEFAULT_INDEX_JSON) -> None:
         self.timestamp = datetime.now(timezone.utc)
         logger.info(f"Index.save {file} {self.timestamp.isoformat()}")
-        Path(file).write_text(self.json(indent=2))
+        Path(file).write_bytes(json_dumps(self.model_dump()))
 
-    def get_version_release_time(self, version: str) -> datetime:
+    def get_version_release_times(self) -> dict[str, datetime]:
+        release_times: dict[str, datetime] = dict()
         for mapping in self.all:
-            if version in [mapping.version_id, mapping.version_file_id]:
-                return mapping.version_release_time
-        raise Exception(f"Index.get_version_release_time {version=} not found")
+            release_times.setdefault(mapping.version_id, mapping.version_release_time)
+            release_times.setdefault(mapping.version_file_id, mapping.version_release_time)
+        return release_times
 
-    def update(self, jars_json: Path | str = DEFAULT_JARS_JSON) -> bool:
+    def update(self, jars: Jars | None = None) -> bool:
         dirty = False
 
-        for jar in Jars.load(jars_json).all:
+        if jars is None:
+            jars = Jars.load()
+
+        for jar in jars.all:
             # init version dict
             if jar.version_id not in self.mappings:
                 self.mappings[jar.version_id] = dict()
@@ -114,16 +118,19 @@ class Index(BaseModel):
             else:
                 jar_dirty = self.mappings[jar.version_id][jar.jar_key].update(jar)
 
-                # sort by jar key
                 if jar_dirty:
-                    self.mappings[jar.version_id] = sort_dict(self.mappings[jar.version_id])
                     dirty = True
 
         if dirty:
+            # sort by jar key
+            for version_id in self.mappings:
+                self.mappings[version_id] = sort_dict(self.mappings[version_id])
+
             # sort by version release time
+            release_times = self.get_version_release_times()
             self.mappings = sort_dict(
                 self.mappings,
-                key=lambda i: self.get_version_release_time(i[0]),
+                key=lambda i: release_times[i[0]],
                 reverse=True,
             )
             logger.info("Index.update updated")
@@ -1,8 +1,11 @@
 import hashlib
 import logging
 import logging.config
+import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import cached_property
 from itertools import chain
 from pathlib import Path
 from zipfile import ZipFile
@@ -12,13 +15,15 @@ from pydantic import BaseModel
 from typing_extensions import Self
 
 from meta import Meta, MetaJar
-from util import StrAlias, progress, sort_dict
+from util import HASH_BUFFER_SIZE, Progress, StrAlias, file_sha1, json_dumps, json_loads, sort_dict
 
 
 DIR = Path(__file__).parent
 MAPPINGS_DIR = Path(DIR / "mappings")
 MAPPINGIO_JAR = Path(DIR / "mapping-io-cli-0.3.0-all.jar")
 DEFAULT_JARS_JSON = Path(DIR / "jars.json")
+DOWNLOAD_WORKERS = 8
+MAPPINGIO_WORKERS = os.cpu_count()
 
 
 logging.config.fileConfig("logging.conf")
@@ -35,11 +40,11 @@ class JarsJar(BaseModel):
     jar_filename: str
     map_filename: str
 
-    @property
+    @cached_property
     def jar_path(self) -> Path:
         return Path(MAPPINGS_DIR / self.jar_filename).relative_to(DIR)
 
-    @property
+    @cached_property
     def map_path(self) -> Path:
         return Path(MAPPINGS_DIR / self.map_filename).relative_to(DIR)
 
@@ -51,8 +56,8 @@ class JarsJar(BaseModel):
             raise Exception("mapping-io-cli error")
 
     @classmethod
-    def from_meta_jar(cls, meta_jar: MetaJar):
-        self = cls(
+    def empty(cls, meta_jar: MetaJar) -> Self:
+        return cls(
             version_id=meta_jar.version_id,
             version_file_id=meta_jar.version_file_id,
             version_release_time=meta_jar.version_release_time,
@@ -62,10 +67,35 @@ class JarsJar(BaseModel):
             jar_filename=meta_jar.filename("jar"),
             map_filename=meta_jar.filename("tiny"),
         )
-        self.update(meta_jar=meta_jar)
+
+    @classmethod
+    def from_meta_jar(cls, meta_jar: MetaJar, local_sha1: str | None = None) -> Self:
+        self = cls.empty(meta_jar)
+        self.update(meta_jar=meta_jar, local_sha1=local_sha1)
         return self
 
-    def update(self, meta_jar: MetaJar) -> bool:
+    def download(self, meta_jar: MetaJar, session: requests.Session) -> str:
+        # keep local jar if it or its bundle matches the meta jar
+        if self.jar_path.exists():
+            local_sha1 = file_sha1(self.jar_path)
+            jar_bundle_path = self.jar_path.with_suffix(".bundle.jar")
+            if meta_jar.sha1 == local_sha1 or (
+                jar_bundle_path.exists() and meta_jar.sha1 == file_sha1(jar_bundle_path)
+            ):
+                return local_sha1
+
+        # stream jar to disk and hash it on the way
+        logger.info(f"JarsJar.download {self.jar_path}")
+        sha1 = hashlib.sha1()
+        with session.get(meta_jar.url, stream=True) as response:
+            response.raise_for_status()
+            with self.jar_path.open("wb") as file:
+                for chunk in response.iter_content(HASH_BUFFER_SIZE):
+                    sha1.update(chunk)
+                    file.write(chunk)
+        return sha1.hexdigest()
+
+    def update(self, meta_jar: MetaJar, local_sha1: str | None = None) -> bool:
         dirty = False
 
         log_prefix = f"JarsJar.update {self.jar_path}"
@@ -73,21 +103,15 @@ class JarsJar(BaseModel):
         # update if meta jar sha1 has changed
         if meta_jar.sha1 != self.jar_sha1_meta:
             # download jar if necessary
-            jar_bundle_path = self.jar_path.with_suffix(".bundle.jar")
-            if not self.jar_path.exists() or (
-                meta_jar.sha1 != hashlib.sha1(self.jar_path.read_bytes()).hexdigest()
-                and (
-                    not jar_bundle_path.exists()
-                    or meta_jar.sha1 != hashlib.sha1(jar_bundle_path.read_bytes()).hexdigest()
-                )
-            ):
-                logger.info(f"{log_prefix} download")
-                self.jar_path.write_bytes(requests.get(meta_jar.url).content)
+            if local_sha1 is None:
+                with requests.Session() as session:
+                    local_sha1 = self.download(meta_jar, session)
 
             # extract and rename jar if local jar is a bundle
             unbundled_jar_bytes = None
             with ZipFile(self.jar_path) as jar_zip:
-                if "META-INF/versions.list" in jar_zip.namelist():
+                # name lookup in the central directory dict, without building a name list
+                if "META-INF/versions.list" in jar_zip.NameToInfo:
                     logger.info(f"{log_prefix} extract bundle")
 
                     versions_list = jar_zip.read("META-INF/versions.list").decode("utf-8")
@@ -102,15 +126,14 @@ class JarsJar(BaseModel):
                     unbundled_jar_bytes = jar_zip.read(f"META-INF/versions/{version_path}")
 
             if unbundled_jar_bytes:
+                local_sha1 = hashlib.sha1(unbundled_jar_bytes).hexdigest()
+                jar_bundle_path = self.jar_path.with_suffix(".bundle.jar")
                 self.jar_path.rename(jar_bundle_path.absolute().relative_to(Path.cwd()))
                 self.jar_path.write_bytes(unbundled_jar_bytes)
 
-            # create java descriptions
-            self.mappingio()
-
             # update jar sha1s
             self.jar_sha1_meta = meta_jar.sha1
-            self.jar_sha1_local = hashlib.sha1(self.jar_path.read_bytes()).hexdigest()
+            self.jar_sha1_local = local_sha1
 
             logger.info(f"{log_prefix} done")
 
@@ -124,7 +147,7 @@ class Jars(BaseModel):
 
     @property
     def all(self) -> chain[JarsJar]:
-        return chain(*[version.values() for version in self.versions.values()])
+        return chain.from_iterable(version.values() for version in self.versions.values())
 
     @classmethod
     def empty(cls) -> Self:
@@ -133,65 +156,106 @@ class Jars(BaseModel):
     @classmethod
     def load(cls, file: Path | str = DEFAULT_JARS_JSON) -> Self:
         logger.info(f"Jars.load {file}")
-        return cls.parse_raw(Path(file).read_text())
+        return cls.model_validate(json_loads(Path(file).read_bytes()))
 
     def save(self, file: Path | str = DEFAULT_JARS_JSON) -> None:
         logger.info(f"Jars.save {file}")
-        Path(file).write_text(self.json(indent=2))
+        Path(file).write_bytes(json_dumps(self.model_dump()))
 
-    def get_version_release_time(self, version: str) -> datetime:
+    def get_version_release_times(self) -> dict[str, datetime]:
+        release_times: dict[str, datetime] = dict()
         for jar in self.all:
-            if version in [jar.version_id, jar.version_file_id]:
-                return jar.version_release_time
-        raise Exception(f"Jars.get_version_release_time {version=} not found")
+            release_times.setdefault(jar.version_id, jar.version_release_time)
+            release_times.setdefault(jar.version_file_id, jar.version_release_time)
+        return release_times
+
+    def download(self, meta: Meta) -> dict[tuple[str, str], str]:
+        # collect jars with changed meta sha1, each jar file only once
+        downloads: dict[str, tuple[JarsJar, MetaJar]] = dict()
+        for mc_version in reversed(meta.minecraft):
+            for jar_name, meta_jar in mc_version.jars.items():
+                jar = self.versions.get(mc_version.id, dict()).get(jar_name)
+                if not jar:
+                    jar = JarsJar.empty(meta_jar)
+                if jar.jar_sha1_meta != meta_jar.sha1 and jar.jar_filename not in downloads:
+                    downloads[jar.jar_filename] = (jar, meta_jar)
+
+        # download jars in parallel over one connection pool
+        logger.info(f"Jars.download {len(downloads)} changed jars")
+        with requests.Session() as session, ThreadPoolExecutor(DOWNLOAD_WORKERS) as executor:
+            local_sha1s = executor.map(
+                lambda download: download[0].download(download[1], session),
+                downloads.values(),
+            )
+            return {
+                (jar.jar_filename, meta_jar.sha1): local_sha1
+                for (jar, meta_jar), local_sha1 in zip(downloads.values(), local_sha1s)
+            }
 
-    def update(self) -> bool:
+    def update(self, meta: Meta | None = None) -> bool:
         dirty = False
 
-        # iterate over minecraft versions in meta
-        meta = Meta.load()
+        if meta is None:
+            meta = Meta.load()
+
+        # download changed jars up front
+        local_sha1s = self.download(meta)
+
+        # jars that need new java descriptions
+        mappingio_jars: dict[str, JarsJar] = dict()
 
-        i_max = len(meta.minecraft)
+        # iterate over minecraft versions in meta
+        progress = Progress(len(meta.minecraft))
         for i, mc_version in enumerate(reversed(meta.minecraft)):
-            prefix_start = f"Jars.update {progress(i, i_max)} {mc_version.id}"
-            prefix_end = f"Jars.update {progress(i + 1, i_max)} {mc_version.id}"
-            logger.info(prefix_start)
+            prefix = f"Jars.update {progress(i + 1)} {mc_version.id}"
 
             # init version dict
             if mc_version.id not in self.versions:
                 self.versions[mc_version.id] = dict()
                 dirty = True
 
-            j_max = len(mc_version.jars)
+            jar_progress = Progress(len(mc_version.jars))
             for j, (jar_name, meta_jar) in enumerate(mc_version.jars.items()):
-                jar_prefix_start = f"{prefix_start} {progress(j, j_max)} {jar_name}"
-                jar_prefix_end = f"{prefix_start} {progress(j + 1, j_max)} {jar_name}"
-                logger.info(jar_prefix_start)
+                jar_prefix = f"{prefix} {jar_progress(j + 1)} {jar_name}"
+
+                local_sha1 = local_sha1s.get((meta_jar.filename("jar"), meta_jar.sha1))
 
                 # init new jar
                 if jar_name not in self.versions[mc_version.id]:
-                    self.versions[mc_version.id][jar_name] = JarsJar.from_meta_jar(meta_jar)
-                    logger.info(f"{jar_prefix_end} initialized")
+                    jar = JarsJar.from_meta_jar(meta_jar, local_sha1=local_sha1)
+                    self.versions[mc_version.id][jar_name] = jar
+                    mappingio_jars[jar.jar_filename] = jar
+                    logger.info(f"{jar_prefix} initialized")
                     dirty = True
                     continue
 
                 # update existing jar
-                version_dirty = self.versions[mc_version.id][jar_name].update(meta_jar=meta_jar)
+                jar = self.versions[mc_version.id][jar_name]
+                version_dirty = jar.update(meta_jar=meta_jar, local_sha1=local_sha1)
 
                 if version_dirty:
-                    self.versions[mc_version.id] = sort_dict(self.versions[mc_version.id])
-                    logger.info(f"{jar_prefix_end} updated")
+                    mappingio_jars[jar.jar_filename] = jar
+                    logger.info(f"{jar_prefix} updated")
                     dirty = True
                 else:
-                    logger.info(f"{jar_prefix_end} skipped")
+                    logger.info(f"{jar_prefix} skipped")
 
-            logger.info(f"{prefix_end} done")
+            logger.info(f"{prefix} done")
+
+        # create java descriptions in parallel, one jvm per jar
+        with ThreadPoolExecutor(MAPPINGIO_WORKERS) as executor:
+            list(executor.map(JarsJar.mappingio, mappingio_jars.values()))
 
         if dirty:
+            # sort by jar key
+            for version_id in self.versions:
+                self.versions[version_id] = sort_dict(self.versions[version_id])
+
             # sort by version release time
+            release_times = self.get_version_release_times()
             self.versions = sort_dict(
                 self.versions,
-                key=lambda i: self.get_version_release_time(i[0]),
+                key=lambda i: release_times[i[0]],
                 reverse=True,
             )
 
@@ -1,20 +1,22 @@
 import hashlib
-import json
 import logging
 import logging.config
+import os
 from datetime import datetime
 from pathlib import Path
+from typing import Any
 
 from git.repo import Repo
 from pydantic import BaseModel
 from typing_extensions import Self
 
-from util import progress, sort_dict
+from util import Progress, json_dumps, json_loads, sort_dict
 
 
 DIR = Path(__file__).parent
 META_DIR = Path(DIR / "multimc-meta-upstream")
 DEFAULT_META_JSON = Path(DIR / "meta.json")
+DEFAULT_STAT_CACHE_JSON = Path(DIR / ".meta_stat_cache.json")
 JAR_NAMES = ["client", "server", "windows_server"]
 
 
@@ -22,6 +24,20 @@ logging.config.fileConfig("logging.conf")
 logger = logging.getLogger("meta")
 
 
+def read_version_json(version_json: Path, sha1: str) -> tuple[str, str, dict[str, Any] | None]:
+    version_json_bytes = version_json.read_bytes()
+    version_json_sha1 = hashlib.sha1(version_json_bytes).hexdigest()
+
+    # only parse changed json files
+    if sha1 == version_json_sha1:
+        return version_json.stem, version_json_sha1, None
+
+    # keep only the fields MetaVersion.update_data reads
+    data = json_loads(version_json_bytes)
+    data = {key: data[key] for key in ["id", "releaseTime", "downloads"]}
+    return version_json.stem, version_json_sha1, data
+
+
 class MetaJar(BaseModel):
     version_id: str
     version_file_id: str
@@ -92,21 +108,20 @@ class MetaVersion(BaseModel):
         )
 
     def update(self, version_json: Path) -> bool:
-        version_json_sha1 = hashlib.sha1(version_json.read_bytes()).hexdigest()
+        return self.update_data(*read_version_json(version_json, self.sha1))
 
-        if self.sha1 == version_json_sha1:
+    def update_data(self, file_id: str, sha1: str, data: dict[str, Any] | None) -> bool:
+        if data is None:
             # same json file, nothing to do
             logger.info(f"MetaVersion.update {self.file_id} skipped")
             return False
 
-        version_json_data = json.load(version_json.open())
-
-        self.id = version_json_data["id"]
-        self.file_id = version_json.stem
-        self.release_time = datetime.fromisoformat(version_json_data["releaseTime"])
-        self.sha1 = version_json_sha1
+        self.id = data["id"]
+        self.file_id = file_id
+        self.release_time = datetime.fromisoformat(data["releaseTime"])
+        self.sha1 = sha1
 
-        for download_name, download in sorted(version_json_data["downloads"].items()):
+        for download_name, download in sorted(data["downloads"].items()):
             # skip mappings
             if download_name not in JAR_NAMES:
                 continue
@@ -143,22 +158,27 @@ class Meta(BaseModel):
     @classmethod
     def load(cls, file: Path | str = DEFAULT_META_JSON) -> Self:
         logger.info(f"Meta.load {file}")
-        return cls.parse_raw(Path(file).read_text())
+        return cls.model_validate(json_loads(Path(file).read_bytes()))
 
     def save(self, file: Path | str = DEFAULT_META_JSON) -> None:
         logger.info(f"Meta.save {file}")
-        Path(file).write_text(self.json(indent=2))
+        Path(file).write_bytes(json_dumps(self.model_dump()))
 
     def pull_and_update(self) -> bool:
         dirty = False
 
-        # pull submodule
-        logger.info(f"Meta.pull_and_update pulling submodule")
+        # fetch submodule
+        logger.info(f"Meta.pull_and_update fetching submodule")
         repo = Repo(META_DIR)
-        repo.git.pull("origin", "master")
+        repo.remotes.origin.fetch("master")
+        latest_commit = repo.remotes.origin.refs.master.commit.hexsha
+
+        # only touch the working tree if there are new commits
+        if repo.head.commit.hexsha != latest_commit:
+            logger.info(f"Meta.pull_and_update merging {latest_commit}")
+            repo.git.merge("--ff-only", "origin/master")
 
         # compare commit hash
-        latest_commit = repo.head.commit.hexsha
         if self.commit == latest_commit:
             # no changes and nothing to do
             logger.info(f"Meta.pull_and_update already up to date")
@@ -175,33 +195,65 @@ class Meta(BaseModel):
 
         return dirty
 
-    def update(self) -> bool:
+    def update(self, stat_cache_json: Path | str = DEFAULT_STAT_CACHE_JSON) -> bool:
         dirty = False
 
         # iterate over mojang version json files
-        version_json_files = sorted(Path(META_DIR / "mojang/versions").iterdir())
-
-        i_max = len(version_json_files)
-        for i, file in enumerate(version_json_files):
-            logger.info(f"Meta.update {progress(i, i_max)} {file.stem}")
+        with os.scandir(META_DIR / "mojang/versions") as entries:
+            version_json_files = sorted(
+                (entry for entry in entries if entry.is_file()), key=lambda entry: entry.name
+            )
 
-            # find existing version
-            file_version = None
-            for existing_version in self.minecraft:
-                if existing_version.file_id == file.stem:
-                    file_version = existing_version
-                    break
+        # size, mtime and sha1 of version json files at the last update
+        stat_cache_json = Path(stat_cache_json)
+        stat_cache: dict[str, list[int | str]] = dict()
+        if stat_cache_json.exists():
+            stat_cache = json_loads(stat_cache_json.read_bytes())
+
+        # find existing versions
+        versions_by_file_id = {version.file_id: version for version in self.minecraft}
+        file_ids = list()
+        file_versions = list()
+        file_stats = list()
+        changed_files = list()
+        changed_versions = list()
+        for file in version_json_files:
+            file_id = os.path.splitext(file.name)[0]
+            file_version = versions_by_file_id.get(file_id)
 
             # init version if not found
             if not file_version:
                 file_version = MetaVersion.empty()
+                versions_by_file_id[file_id] = file_version
                 self.minecraft.append(file_version)
 
-            # update version
-            version_dirty = file_version.update(file)
+            file_ids.append(file_id)
+            file_versions.append(file_version)
+
+            # only hash files that changed since the last update
+            file_stat = file.stat()
+            file_stats.append([file_stat.st_size, file_stat.st_mtime_ns])
+            if stat_cache.get(file_id) != [*file_stats[-1], file_version.sha1]:
+                changed_files.append(Path(file.path))
+                changed_versions.append(file_version)
+
+        logger.info(f"Meta.update {len(changed_files)} of {len(version_json_files)} files changed")
+
+        # hash, parse and update changed versions
+        progress = Progress(len(changed_files))
+        for i, (file, file_version) in enumerate(zip(changed_files, changed_versions)):
+            result = read_version_json(file, file_version.sha1)
+            version_dirty = file_version.update_data(*result)
             dirty = dirty or version_dirty
 
-            logger.info(f"Meta.update {progress(i + 1, i_max)} {file.stem}")
+            logger.info(f"Meta.update {progress(i + 1)} {result[0]}")
+
+        # save stats of the now hashed files
+        stat_cache = {
+            file_id: [*file_stat, file_version.sha1]
+            for file_id, file_stat, file_version in zip(file_ids, file_stats, file_versions)
+        }
+        stat_cache_json.write_bytes(json_dumps(stat_cache))
 
         if dirty:
             # sort by version release time
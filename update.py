@@ -21,12 +21,12 @@ def update(push: bool = False) -> None:
 
         # updat jars
         jars = Jars.load()
-        if jars.update():
+        if jars.update(meta):
             jars.save()
 
             # update index
             index = Index.load()
-            if index.update():
+            if index.update(jars):
                 index.save()
 
     if push:
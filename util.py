@@ -1,15 +1,26 @@
+import hashlib
+from pathlib import Path
 from typing import Any, Callable, TypeVar
 
+import orjson
+
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
 
 class StrAlias:
     minecraft_version = str
     jar_key = str
 
 
-def progress(i: int, max: int) -> str:
-    width = len(str(max))
-    percent = f"{(i/max)*100:.2f}%".rjust(7, "_")
-    return f"{percent} {str(i).rjust(width, '_')}/{str(max).rjust(width, '_')}"
+class Progress:
+    def __init__(self, max: int) -> None:
+        self.max = max
+        self.width = len(str(max))
+
+    def __call__(self, i: int) -> str:
+        percent = f"{(i/self.max)*100:.2f}%"
+        return f"{percent:_>7} {i:_>{self.width}}/{self.max}"
 
 
 K = TypeVar("K")
@@ -21,4 +32,28 @@ def sort_dict(
     key: Callable[[tuple[K, V]], Any] | None = None,
     reverse: bool = False,
 ) -> dict[K, V]:
-    return {k: v for k, v in sorted(dict_in.items(), key=key, reverse=reverse)}
+    return dict(sorted(dict_in.items(), key=key, reverse=reverse))
+
+
+def file_sha1(path: Path) -> str:
+    # stream in fixed size blocks instead of reading whole jars into memory
+    sha1 = hashlib.sha1()
+    with path.open("rb", buffering=0) as file:
+        while chunk := file.read(HASH_BUFFER_SIZE):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _json_default(obj: Any) -> Any:
+    # orjson encodes datetimes itself, only paths are left
+    if isinstance(obj, Path):
+        return obj.as_posix()
+    raise TypeError(f"json_dumps can not serialize {type(obj).__name__}")
+
+
+def json_loads(data: bytes) -> Any:
+    return orjson.loads(data)
+
+
+def json_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=_json_default)